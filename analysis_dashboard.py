@@ -8,6 +8,85 @@ from datetime import datetime
 import io
 import base64
 
+def _select_rows(data, filters):
+    """Keep the rows matching every (column, selected values) filter"""
+    if not filters:
+        return data
+    
+    # Combine all filters into one mask so the frame is sliced only once
+    mask = np.ones(len(data), dtype=bool)
+    for col, selected in filters:
+        mask &= data[col].isin(selected).to_numpy()
+    return data.loc[mask]
+
+def _has_value(series):
+    """Boolean mask of non-null entries, read straight from the codes for categorical columns"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy() != -1
+    return series.notna().to_numpy()
+
+def _mode_by_codes(group_codes, value_codes, n_groups, n_values):
+    """Return the row count and most common value code of each group from categorical codes"""
+    # One bincount over a (group x value) table; column 0 holds missing values (code -1),
+    # which count towards the group size but not the mode. Ties go to the lowest code, like mode().
+    width = n_values + 1
+    pairs = group_codes.astype(np.intp) * width + value_codes.astype(np.intp) + 1
+    counts = np.bincount(pairs, minlength=n_groups * width).reshape(n_groups, width)
+    
+    mode_codes = np.full(n_groups, -1, dtype=np.intp)
+    if n_values:
+        value_counts = counts[:, 1:]
+        has_value = value_counts.max(axis=1) > 0
+        mode_codes[has_value] = value_counts[has_value].argmax(axis=1)
+    return counts.sum(axis=1), mode_codes
+
+def _select_hierarchy(data, hierarchy, filters):
+    """Select rows through the sorted (Management Unit, Fleet Name, vessel) index instead of column masks"""
+    selected = dict(filters)
+    key = tuple(list(selected[level]) if level in selected else slice(None) for level in hierarchy.index.names)
+    try:
+        positions = hierarchy.to_numpy()[hierarchy.index.get_locs(key)]
+    except KeyError:
+        # A selected value has no rows in the index; the mask path handles that case
+        return _select_rows(data, filters)
+    
+    # Keep the original row order so results match the mask path
+    return data.iloc[np.sort(positions)]
+
+def _count_unique(series):
+    """Number of distinct non-null values, counted from the codes for categorical columns"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        return int(np.count_nonzero(np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))))
+    return series.nunique()
+
+def _render_metrics(metrics):
+    """Lay out (label, value) metrics side by side, one column each"""
+    for column, (label, value) in zip(st.columns(len(metrics)), metrics):
+        column.metric(label, value)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _filter_data(_data, data_token, filters, _hierarchy=None):
+    """Apply filters to the data, cached per upload and filter state"""
+    if _hierarchy is not None and all(col in _hierarchy.index.names for col, _ in filters):
+        return _select_hierarchy(_data, _hierarchy, filters)
+    return _select_rows(_data, filters)
+
+@st.cache_data(show_spinner=False)
+def _filter_options(_data, data_token, column, filters):
+    """Sorted non-null values of a column within the parent filter selection, cached per upload"""
+    values = _select_rows(_data, filters)[column]
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return sorted(values.dropna().unique())
+    
+    # Categories are already sorted, so only the ones present in the selection need picking out
+    categories = values.cat.categories
+    if not filters:
+        return categories.tolist()
+    codes = values.cat.codes.to_numpy()
+    present = np.bincount(codes[codes >= 0], minlength=len(categories)) > 0
+    return categories[present].tolist()
+
 class AnalysisDashboard:
     """Main dashboard component for displaying analysis results"""
     
@@ -15,91 +94,70 @@ class AnalysisDashboard:
         self.data_processor = data_processor
         self.kpi_calculator = kpi_calculator
         self.visualizer = visualizer
+        
+        # Schema checks used by every section, computed once per dashboard
+        self._cols = set(data_processor.get_data().columns)
+        self._has_fleet = {'Management Unit', 'Fleet Name'}.issubset(self._cols)
     
     def render(self):
         """Render the simplified analysis dashboard"""
+        data = self.data_processor.get_data()
+        config = self.data_processor.get_config()
+        vessel_col, eform_col, job_col = config['vessel_col'], config['eform_col'], config['job_col']
+        
+        # Apply current filters once and share the result between sections
+        filtered_data = self._apply_vessel_filter(data, vessel_col, eform_col, job_col)
+        
         # Basic data overview
-        self._render_basic_overview()
+        self._render_basic_overview(filtered_data, vessel_col, eform_col)
         
         # Vessel filtering
-        self._render_vessel_filter()
+        self._render_vessel_filter(data, vessel_col, eform_col, job_col)
         
         # Unique vessels list
-        self._render_unique_vessels()
+        self._render_unique_vessels(filtered_data, vessel_col)
         
         # Unique E-forms with frequency
-        self._render_eforms_with_frequency()
+        self._render_eforms_with_frequency(filtered_data)
         
         # Job codes and titles with E-forms
-        self._render_jobs_with_eforms()
+        self._render_jobs_with_eforms(filtered_data, vessel_col)
     
-    def _render_basic_overview(self):
+    def _render_basic_overview(self, filtered_data, vessel_col, eform_col):
         """Render basic data overview"""
         st.header("📋 E-Form Data Analysis")
         
-        data = self.data_processor.get_data()
-        config = self.data_processor.get_config()
-        
-        # Apply current filters to get filtered data for KPIs
-        filtered_data = self._apply_vessel_filter(data, config)
+        metrics = [
+            ("Total Records", len(filtered_data)),
+            ("Unique Vessels", _count_unique(filtered_data[vessel_col])),
+            ("Unique E-Forms", _count_unique(filtered_data[eform_col]))
+        ]
         
-        # Check if fleet data is available
-        has_fleet_data = 'Management Unit' in data.columns and 'Fleet Name' in data.columns
+        # Fleet KPIs are only shown when fleet data is available
+        if self._has_fleet:
+            metrics += [
+                ("Unique Management Units", _count_unique(filtered_data['Management Unit'])),
+                ("Unique Fleet Names", _count_unique(filtered_data['Fleet Name']))
+            ]
         
-        if has_fleet_data:
-            # Show all KPIs when fleet data is available
-            col1, col2, col3, col4, col5 = st.columns(5)
-            
-            with col1:
-                st.metric("Total Records", len(filtered_data))
-            
-            with col2:
-                unique_vessels = filtered_data[config['vessel_col']].nunique()
-                st.metric("Unique Vessels", unique_vessels)
-            
-            with col3:
-                unique_eforms = filtered_data[config['eform_col']].dropna().nunique()
-                st.metric("Unique E-Forms", unique_eforms)
-            
-            with col4:
-                unique_mgmt_units = filtered_data['Management Unit'].nunique()
-                st.metric("Unique Management Units", unique_mgmt_units)
-            
-            with col5:
-                unique_fleet_names = filtered_data['Fleet Name'].nunique()
-                st.metric("Unique Fleet Names", unique_fleet_names)
-        else:
-            # Show only basic KPIs when fleet data is not available
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.metric("Total Records", len(filtered_data))
-            
-            with col2:
-                unique_vessels = filtered_data[config['vessel_col']].nunique()
-                st.metric("Unique Vessels", unique_vessels)
-            
-            with col3:
-                unique_eforms = filtered_data[config['eform_col']].dropna().nunique()
-                st.metric("Unique E-Forms", unique_eforms)
+        _render_metrics(metrics)
     
-    def _render_vessel_filter(self):
+    def _render_vessel_filter(self, data, vessel_col, eform_col, job_col):
         """Render filtering section - shows fleet filters only if fleet data is loaded"""
-        data = self.data_processor.get_data()
-        config = self.data_processor.get_config()
+        data_token = st.session_state.get('data_token')
         
         st.header("🔍 Filter Options")
         
-        # Check if fleet data is available
-        has_fleet_data = 'Management Unit' in data.columns and 'Fleet Name' in data.columns
+        # Parent selections that narrow down the options of the dependent filters
+        hierarchy_filters = []
         
-        if has_fleet_data:
+        if self._has_fleet:
             # Show hierarchical filtering when fleet data is available
             col1, col2, col3 = st.columns(3)
             
             with col1:
                 st.subheader("🏢 Management Unit")
-                management_units = sorted(data['Management Unit'].dropna().unique())
+                management_units = _filter_options(data, data_token, 'Management Unit', ())
                 selected_mgmt_units = st.multiselect(
                     "Select Management Units:",
                     options=["All"] + management_units,
@@ -110,13 +168,11 @@ class AnalysisDashboard:
                 
                 # Filter data based on management unit selection
                 if 'All' not in selected_mgmt_units:
-                    filtered_data = data[data['Management Unit'].isin(selected_mgmt_units)]
-                else:
-                    filtered_data = data
+                    hierarchy_filters.append(('Management Unit', tuple(selected_mgmt_units)))
             
             with col2:
                 st.subheader("⛵ Fleet Name")
-                available_fleet_names = sorted(filtered_data['Fleet Name'].dropna().unique())
+                available_fleet_names = _filter_options(data, data_token, 'Fleet Name', tuple(hierarchy_filters))
                 selected_fleet_names = st.multiselect(
                     "Select Fleet Names:",
                     options=["All"] + available_fleet_names,
@@ -127,12 +183,11 @@ class AnalysisDashboard:
                 
                 # Further filter data based on fleet name selection
                 if 'All' not in selected_fleet_names:
-                    filtered_data = filtered_data[filtered_data['Fleet Name'].isin(selected_fleet_names)]
+                    hierarchy_filters.append(('Fleet Name', tuple(selected_fleet_names)))
             
             with col3:
                 st.subheader("🚢 Vessel")
-                vessel_col = config['vessel_col']
-                available_vessels = sorted(filtered_data[vessel_col].dropna().unique())
+                available_vessels = _filter_options(data, data_token, vessel_col, tuple(hierarchy_filters))
                 selected_vessels = st.multiselect(
                     "Select Vessels:",
                     options=["All"] + available_vessels,
@@ -143,8 +198,7 @@ class AnalysisDashboard:
         else:
             # Show only vessel filter when fleet data is not available
             st.subheader("🚢 Vessel")
-            vessel_col = config['vessel_col']
-            available_vessels = sorted(data[vessel_col].dropna().unique())
+            available_vessels = _filter_options(data, data_token, vessel_col, ())
             selected_vessels = st.multiselect(
                 "Select Vessels:",
                 options=["All"] + available_vessels,
@@ -152,7 +206,6 @@ class AnalysisDashboard:
                 help="Filter by individual vessels",
                 key="vessel_filter"
             )
-            filtered_data = data
         
         # Additional filters row
         st.write("---")
@@ -160,8 +213,7 @@ class AnalysisDashboard:
         
         with col4:
             st.subheader("📝 E-Form Name")
-            eform_col = config['eform_col']
-            available_eforms = sorted(filtered_data[eform_col].dropna().unique())
+            available_eforms = _filter_options(data, data_token, eform_col, tuple(hierarchy_filters))
             selected_eforms = st.multiselect(
                 "Select E-Forms:",
                 options=["All"] + available_eforms,
@@ -172,8 +224,7 @@ class AnalysisDashboard:
         
         with col5:
             st.subheader("💼 Job Code")
-            job_col = config['job_col']
-            available_jobs = sorted(filtered_data[job_col].dropna().unique())
+            available_jobs = _filter_options(data, data_token, job_col, tuple(hierarchy_filters))
             selected_jobs = st.multiselect(
                 "Select Job Codes:",
                 options=["All"] + available_jobs,
@@ -182,65 +233,72 @@ class AnalysisDashboard:
                 key="job_filter"
             )
     
-    def _render_unique_vessels(self):
+    def _render_unique_vessels(self, filtered_data, vessel_col):
         """Render unique vessels list"""
         st.header("🚢 Unique Vessels List")
         
-        data = self.data_processor.get_data()
-        config = self.data_processor.get_config()
-        
-        # Apply vessel filter if exists
-        filtered_data = self._apply_vessel_filter(data, config)
-        
-        # Check if fleet data is available
-        has_fleet_data = 'Management Unit' in data.columns and 'Fleet Name' in data.columns
-        
         # Get unique vessels with counts and management/fleet information only if fleet data is loaded
-        group_columns = [config['vessel_col']]
+        group_columns = [vessel_col]
         column_names = ['Vessel Name']
         
-        if has_fleet_data and 'Management Unit' in filtered_data.columns:
-            group_columns.append('Management Unit')
-            column_names.append('Management Unit')
+        if self._has_fleet:
+            group_columns += ['Management Unit', 'Fleet Name']
+            column_names += ['Management Unit', 'Fleet Name']
         
-        if has_fleet_data and 'Fleet Name' in filtered_data.columns:
-            group_columns.append('Fleet Name')
-            column_names.append('Fleet Name')
-        
-        if len(group_columns) > 1:
-            vessel_summary = filtered_data.groupby(group_columns).size().reset_index(name='Total Records')
-            vessel_summary.columns = column_names + ['Total Records']
-        else:
-            vessel_summary = filtered_data[config['vessel_col']].value_counts().reset_index()
-            vessel_summary.columns = ['Vessel Name', 'Total Records']
+        # Count on the categorical codes; observed=True skips combinations without rows
+        vessel_summary = (
+            filtered_data.groupby(group_columns, observed=True)
+            .size()
+            .reset_index(name='Total Records')
+            .set_axis(column_names + ['Total Records'], axis=1)
+        )
         
         st.dataframe(vessel_summary, use_container_width=True, hide_index=True)
     
-    def _render_eforms_with_frequency(self):
+    def _render_eforms_with_frequency(self, filtered_data):
         """Render unique E-forms with frequency"""
         st.header("📝 E-Forms with Frequency")
         
-        data = self.data_processor.get_data()
-        config = self.data_processor.get_config()
-        
-        # Apply vessel filter if exists
-        filtered_data = self._apply_vessel_filter(data, config)
-        
         # Get E-forms with frequency and record count only
-        eform_data = filtered_data[['E-Form', 'Frequency']].dropna(subset=['E-Form'])
+        eform_data = filtered_data.loc[_has_value(filtered_data['E-Form']), ['E-Form', 'Frequency']]
         
         if not eform_data.empty:
-            # Group by E-Form and get frequency information
-            eform_summary = eform_data.groupby('E-Form').agg({
-                'Frequency': lambda x: x.mode().iloc[0] if not x.mode().empty else 'Unknown'
-            }).reset_index()
+            eforms, frequencies = eform_data['E-Form'], eform_data['Frequency']
             
-            # Add count of records for each E-form
-            eform_counts = filtered_data['E-Form'].value_counts().reset_index()
-            eform_counts.columns = ['E-Form', 'Record_Count']
+            if isinstance(eforms.dtype, pd.CategoricalDtype) and isinstance(frequencies.dtype, pd.CategoricalDtype):
+                # Count (E-Form, Frequency) code pairs in one pass and take the most common code per E-Form
+                record_counts, mode_codes = _mode_by_codes(
+                    eforms.cat.codes.to_numpy(), frequencies.cat.codes.to_numpy(),
+                    len(eforms.cat.categories), len(frequencies.cat.categories)
+                )
+                present = record_counts > 0
+                
+                # Code -1 (no Frequency value) picks the trailing 'Unknown' label
+                labels = np.append(frequencies.cat.categories.to_numpy(dtype=object), 'Unknown')
+                final_eforms = pd.DataFrame({
+                    'E-Form': eforms.cat.categories[present],
+                    'Frequency': labels[mode_codes[present]],
+                    'Record_Count': record_counts[present]
+                })
+            else:
+                # Count (E-Form, Frequency) pairs once; both the record count and the mode come from these counts
+                pair_counts = (
+                    eform_data.groupby(['E-Form', 'Frequency'], observed=True, dropna=False).size()
+                    .reset_index(name='Record_Count')
+                )
+                
+                # Most common Frequency per E-Form (ties go to the first Frequency in sort order, as with mode())
+                modes = (
+                    pair_counts.dropna(subset=['Frequency'])
+                    .sort_values(['E-Form', 'Record_Count'], ascending=[True, False])
+                    .drop_duplicates('E-Form')[['E-Form', 'Frequency']]
+                )
+                
+                # Total records per E-Form; E-Forms without any Frequency value are reported as 'Unknown'
+                final_eforms = pair_counts.groupby('E-Form', observed=True)['Record_Count'].sum().reset_index()
+                final_eforms = final_eforms.merge(modes, on='E-Form', how='left')
+                final_eforms['Frequency'] = final_eforms['Frequency'].astype(object).fillna('Unknown')
             
-            # Merge the data
-            final_eforms = eform_summary.merge(eform_counts, on='E-Form', how='left')
             final_eforms = final_eforms.sort_values('Record_Count', ascending=False)
             
             # Reorder columns to show E-Form, Frequency, Record_Count
@@ -250,98 +308,73 @@ class AnalysisDashboard:
         else:
             st.warning("No E-form data available for the selected filters.")
     
-    def _render_jobs_with_eforms(self):
+    def _render_jobs_with_eforms(self, filtered_data, vessel_col):
         """Render Job codes and titles where E-form exists"""
         st.header("💼 Jobs with E-Forms")
         
-        data = self.data_processor.get_data()
-        config = self.data_processor.get_config()
+        # Select relevant columns including vessel name and management/fleet-related columns only if fleet data is loaded
+        job_columns = ['Job Code', 'Title', 'E-Form', 'Frequency', vessel_col]
+        if self._has_fleet:
+            job_columns += ['Management Unit', 'Fleet Name']
         
-        # Apply vessel filter if exists
-        filtered_data = self._apply_vessel_filter(data, config)
+        available_columns = [col for col in job_columns if col in self._cols]
         
-        # Filter only records that have E-forms
-        jobs_with_eforms = filtered_data[filtered_data['E-Form'].notna()]
+        # Filter only records that have E-forms, keeping just the displayed columns
+        jobs_with_eforms = filtered_data.loc[_has_value(filtered_data['E-Form']), available_columns]
         
         if not jobs_with_eforms.empty:
-            # Check if fleet data is available
-            has_fleet_data = 'Management Unit' in data.columns and 'Fleet Name' in data.columns
-            
-            # Select relevant columns including vessel name and management/fleet-related columns only if fleet data is loaded
-            job_columns = ['Job Code', 'Title', 'E-Form', 'Frequency', config['vessel_col']]
-            if has_fleet_data and 'Management Unit' in jobs_with_eforms.columns:
-                job_columns.append('Management Unit')
-            if has_fleet_data and 'Fleet Name' in jobs_with_eforms.columns:
-                job_columns.append('Fleet Name')
-            
-            available_columns = [col for col in job_columns if col in jobs_with_eforms.columns]
-            
-            job_display = jobs_with_eforms[available_columns].drop_duplicates()
+            job_display = jobs_with_eforms.drop_duplicates(subset=available_columns, ignore_index=True)
             job_display = job_display.sort_values('Job Code' if 'Job Code' in available_columns else available_columns[0])
             
             st.dataframe(job_display, use_container_width=True, hide_index=True)
             
             # Summary statistics
-            metrics_count = 2  # Base metrics: Total Jobs and Unique E-Forms
-            if 'Management Unit' in job_display.columns:
-                metrics_count += 1
-            if 'Fleet Name' in job_display.columns:
-                metrics_count += 1
-            
-            if metrics_count == 2:
-                col1, col2 = st.columns(2)
-            elif metrics_count == 3:
-                col1, col2, col3 = st.columns(3)
-            else:
-                col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric("Total Jobs with E-Forms", len(job_display))
-            with col2:
-                unique_eforms_in_jobs = job_display['E-Form'].nunique() if 'E-Form' in job_display.columns else 0
-                st.metric("Unique E-Forms in Jobs", unique_eforms_in_jobs)
+            metrics = [
+                ("Total Jobs with E-Forms", len(job_display)),
+                ("Unique E-Forms in Jobs", _count_unique(job_display['E-Form']) if 'E-Form' in self._cols else 0)
+            ]
+            if self._has_fleet:
+                metrics += [
+                    ("Unique Management Units", _count_unique(job_display['Management Unit'])),
+                    ("Unique Fleet Names", _count_unique(job_display['Fleet Name']))
+                ]
             
-            if 'Management Unit' in job_display.columns:
-                with col3:
-                    unique_mgmt_units = job_display['Management Unit'].nunique()
-                    st.metric("Unique Management Units", unique_mgmt_units)
-            
-            if 'Fleet Name' in job_display.columns:
-                with col4 if metrics_count >= 4 else col3:
-                    unique_fleet_names = job_display['Fleet Name'].nunique()
-                    st.metric("Unique Fleet Names", unique_fleet_names)
+            _render_metrics(metrics)
         else:
             st.warning("No jobs with E-forms found for the selected filters.")
     
-    def _apply_vessel_filter(self, data, config):
+    def _apply_vessel_filter(self, data, vessel_col, eform_col, job_col):
         """Apply all filters: management unit, fleet name, vessel, e-form, and job filters based on session state"""
-        filtered_data = data.copy()
+        filters = []
         
         # Apply management unit filter if column exists
-        if ('Management Unit' in filtered_data.columns and 
+        if ('Management Unit' in self._cols and 
             'mgmt_unit_filter' in st.session_state and 
             'All' not in st.session_state.mgmt_unit_filter):
-            filtered_data = filtered_data[filtered_data['Management Unit'].isin(st.session_state.mgmt_unit_filter)]
+            filters.append(('Management Unit', tuple(st.session_state.mgmt_unit_filter)))
         
         # Apply fleet name filter if column exists
-        if ('Fleet Name' in filtered_data.columns and 
+        if ('Fleet Name' in self._cols and 
             'fleet_name_filter' in st.session_state and 
             'All' not in st.session_state.fleet_name_filter):
-            filtered_data = filtered_data[filtered_data['Fleet Name'].isin(st.session_state.fleet_name_filter)]
+            filters.append(('Fleet Name', tuple(st.session_state.fleet_name_filter)))
         
         # Apply vessel filter
         if 'vessel_filter' in st.session_state and 'All' not in st.session_state.vessel_filter:
-            vessel_col = config['vessel_col']
-            filtered_data = filtered_data[filtered_data[vessel_col].isin(st.session_state.vessel_filter)]
+            filters.append((vessel_col, tuple(st.session_state.vessel_filter)))
         
         # Apply e-form filter
         if 'eform_filter' in st.session_state and 'All' not in st.session_state.eform_filter:
-            eform_col = config['eform_col']
-            filtered_data = filtered_data[filtered_data[eform_col].isin(st.session_state.eform_filter)]
+            filters.append((eform_col, tuple(st.session_state.eform_filter)))
         
         # Apply job filter
         if 'job_filter' in st.session_state and 'All' not in st.session_state.job_filter:
-            job_col = config['job_col']
-            filtered_data = filtered_data[filtered_data[job_col].isin(st.session_state.job_filter)]
+            filters.append((job_col, tuple(st.session_state.job_filter)))
+        
+        # Nothing selected - no need to copy the data through the cache
+        if not filters:
+            return data
         
-        return filtered_data
+        # Hierarchy-only selections go through the pre-sorted MultiIndex
+        hierarchy = self.data_processor.get_hierarchy_index() if self._has_fleet else None
+        return _filter_data(data, st.session_state.get('data_token'), tuple(filters), hierarchy)
@@ -7,6 +7,7 @@ import numpy as np
 from datetime import datetime
 import io
 import base64
+import hashlib
 
 # Import custom modules
 from file_handler import FileHandler
@@ -23,6 +24,52 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Low-cardinality text columns used by the dashboard filters and groupings
+CATEGORICAL_COLUMNS = ('Management Unit', 'Fleet Name', 'E-Form', 'Job Code', 'Title', 'Frequency')
+
+# Column name keywords used to auto-detect the vessel and job columns
+VESSEL_KEYWORDS = ('vessel', 'ship', 'boat')
+JOB_KEYWORDS = ('job', 'work', 'task', 'project', 'code')
+
+def _upload_token(*uploaded_files):
+    """Fingerprint uploaded files so cached results are invalidated when an upload changes"""
+    return tuple(
+        hashlib.sha1(f.getvalue()).hexdigest() if f is not None else None
+        for f in uploaded_files
+    )
+
+def _detect_config(columns):
+    """Auto-detect the vessel and job columns from the column names"""
+    vessel_candidates = [col for col in columns if any(keyword in col.lower() for keyword in VESSEL_KEYWORDS)]
+    job_candidates = [col for col in columns if any(keyword in col.lower() for keyword in JOB_KEYWORDS)]
+    
+    return {
+        'vessel_col': vessel_candidates[0] if vessel_candidates else columns[0],
+        'job_col': job_candidates[0] if job_candidates else (columns[1] if len(columns) > 1 else columns[0]),
+        'eform_col': 'E-Form'  # Fixed to use exact column name
+    }
+
+def _to_categorical(data, config):
+    """Store low-cardinality text columns as pandas categoricals"""
+    for col in CATEGORICAL_COLUMNS + (config['vessel_col'],):
+        if col in data.columns:
+            data[col] = data[col].astype('category')
+    return data
+
+def _downcast_numeric(data):
+    """Store numeric columns in the smallest integer/float dtype that holds their values"""
+    for col in data.select_dtypes(include='integer').columns:
+        data[col] = pd.to_numeric(data[col], downcast='integer')
+    for col in data.select_dtypes(include='float').columns:
+        data[col] = pd.to_numeric(data[col], downcast='float')
+    return data
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _build_components(_data, data_token, config):
+    """Build the processing components once per upload and reuse them across reruns"""
+    data_processor = DataProcessor(_data, config)
+    return data_processor, KPICalculator(data_processor), Visualizer()
+
 def main():
     st.title("📊 E-Form Data Analysis Dashboard")
     st.markdown("Upload Excel or CSV files to analyze e-form data with vessel and job-based KPIs")
@@ -67,23 +114,24 @@ def main():
                 with st.spinner("Loading and processing file..."):
                     data = file_handler.process_file(uploaded_file)
                     if data is not None and not data.empty:
+                        # Fingerprint the uploads and detect the configuration only when process_file
+                        # produced a new frame (new upload, sheet or fleet file); reruns served from
+                        # its cache return the same object and keep both
+                        if (st.session_state.data is not data or 'data_token' not in st.session_state
+                                or 'config' not in st.session_state):
+                            st.session_state.data_token = _upload_token(
+                                uploaded_file, st.session_state.uploaded_fleet_file
+                            ) + (st.session_state.get('sheet_selector'), st.session_state.get('fleet_sheet_selector'))
+                            st.session_state.config = _detect_config(data.columns.tolist())
+                            
+                            # Cast filter/group columns once so the dashboard works on integer codes,
+                            # and shrink numeric columns to reduce the bytes scanned downstream; the
+                            # cached frame is converted in place, so reruns find it already converted
+                            _to_categorical(data, st.session_state.config)
+                            _downcast_numeric(data)
                         st.session_state.data = data
                         st.session_state.analysis_complete = True
                         
-                        # Auto-detect and set configuration
-                        columns = data.columns.tolist()
-                        
-                        # Auto-detect potential vessel and job columns
-                        vessel_candidates = [col for col in columns if any(keyword in col.lower() for keyword in ['vessel', 'ship', 'boat'])]
-                        job_candidates = [col for col in columns if any(keyword in col.lower() for keyword in ['job', 'work', 'task', 'project', 'code'])]
-                        
-                        # Store configuration in session state with auto-detected values
-                        st.session_state.config = {
-                            'vessel_col': vessel_candidates[0] if vessel_candidates else columns[0],
-                            'job_col': job_candidates[0] if job_candidates else (columns[1] if len(columns) > 1 else columns[0]),
-                            'eform_col': 'E-Form'  # Fixed to use exact column name
-                        }
-                        
                         st.success(f"✅ File loaded successfully! ({len(data)} rows, {len(data.columns)} columns)")
                     else:
                         st.error("❌ Failed to load file or file is empty")
@@ -96,9 +144,9 @@ def main():
         data = st.session_state.data
         
         # Initialize components
-        data_processor = DataProcessor(data, config)
-        kpi_calculator = KPICalculator(data_processor)
-        visualizer = Visualizer()
+        data_processor, kpi_calculator, visualizer = _build_components(
+            data, st.session_state.data_token, config
+        )
         dashboard = AnalysisDashboard(data_processor, kpi_calculator, visualizer)
         
         # Display dashboard
@@ -5,40 +5,111 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime
+from collections import Counter
 from data_processor import DataProcessor
 from kpi_calculator import KPICalculator
 from visualizer import Visualizer
 
+def _display_name(file_name):
+    """Strip the upload prefix from a stored file name"""
+    return file_name.split('_', 2)[-1] if '_' in file_name else file_name
+
+def _summarize(data, vessel_col, eform_col, job_col):
+    """Distinct counts and top value counts for one file"""
+    has_job = job_col in data.columns
+    return {
+        'overview': {
+            'Total Records': len(data),
+            'Unique Vessels': data[vessel_col].nunique(),
+            'Unique E-Forms': data[eform_col].nunique(),
+            'Unique Jobs': data[job_col].nunique() if has_job else 0,
+            'Management Units': data['Management Unit'].nunique() if 'Management Unit' in data.columns else 0,
+            'Fleet Names': data['Fleet Name'].nunique() if 'Fleet Name' in data.columns else 0
+        },
+        'top_vessels': data[vessel_col].value_counts().head(10),
+        'top_eforms': data[eform_col].value_counts().head(10),
+        'eforms': set(data[eform_col].dropna().unique()),
+        'top_jobs': data[job_col].value_counts().head(10) if has_job else None,
+        'top_jobs_with_eforms': data.loc[data[eform_col].notna(), job_col].value_counts().head(10) if has_job else None
+    }
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _file_summary(_data, file_token, vessel_col, eform_col, job_col):
+    """File summary cached across reruns under the token the file was given at upload"""
+    return _summarize(_data, vessel_col, eform_col, job_col)
+
+def _create_processor(data, config):
+    """Processing components for one file"""
+    data_processor = DataProcessor(data, config)
+    return data_processor, KPICalculator(data_processor)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _build_processor(_data, file_token, config):
+    """Build the processing components for one file once and reuse them across reruns"""
+    return _create_processor(_data, config)
+
 class ComparisonDashboard:
     """Dashboard component for comparing multiple data files"""
     
-    def __init__(self, files_data, config):
+    def __init__(self, files_data, config, file_tokens=None):
         self.files_data = files_data
         self.config = config
         self.file_names = list(files_data.keys())
         
-        # Initialize processors for each file
-        self.processors = {}
-        self.kpi_calculators = {}
-        for name, data in files_data.items():
-            processor = DataProcessor(data, config)
-            self.processors[name] = processor
-            self.kpi_calculators[name] = KPICalculator(processor)
+        # Tokens identify each file's contents (e.g. the upload's file_id) and are computed once at
+        # upload; files without one are summarized per instance and never shared through the cache
+        self._file_tokens = file_tokens or {}
+        self._processors = {}
+        
+        # Per-file display names and summary counts shared by all render sections
+        self._display_names = {name: _display_name(name) for name in self.file_names}
+        self._summaries = {
+            name: self._summary(name, data)
+            for name, data in files_data.items()
+        }
+    
+    def _summary(self, file_name, data):
+        """Summary counts for a file, from the shared cache when the file has an upload token"""
+        vessel_col, eform_col, job_col = self.config['vessel_col'], self.config['eform_col'], self.config['job_col']
+        token = self._file_tokens.get(file_name)
+        if token is None:
+            return _summarize(data, vessel_col, eform_col, job_col)
+        return _file_summary(data, token, vessel_col, eform_col, job_col)
+    
+    def get_processor(self, file_name):
+        """Return the DataProcessor for a file, built on first use"""
+        return self._components(file_name)[0]
+    
+    def get_kpi_calculator(self, file_name):
+        """Return the KPICalculator for a file, built on first use"""
+        return self._components(file_name)[1]
+    
+    def _components(self, file_name):
+        """Processing components for a file, from the shared cache when the file has an upload token"""
+        data = self.files_data[file_name]
+        token = self._file_tokens.get(file_name)
+        if token is not None:
+            return _build_processor(data, token, self.config)
+        if file_name not in self._processors:
+            self._processors[file_name] = _create_processor(data, self.config)
+        return self._processors[file_name]
     
     def render(self):
         """Render the comparison dashboard"""
         st.header("📊 Multi-File Data Comparison")
         
-        # File selection for comparison
-        self._render_file_selector()
+        # File selection for comparison; every section needs at least 2 files
+        selected_files = self._render_file_selector()
+        if len(selected_files) < 2:
+            return
         
         # Comparison overview
-        self._render_comparison_overview()
+        self._render_comparison_overview(selected_files)
         
         # Detailed comparisons
-        self._render_vessel_comparison()
-        self._render_eform_comparison()
-        self._render_job_comparison()
+        self._render_vessel_comparison(selected_files)
+        self._render_eform_comparison(selected_files)
+        self._render_job_comparison(selected_files)
     
     def _render_file_selector(self):
         """Render file selection interface"""
@@ -63,28 +134,15 @@ class ComparisonDashboard:
         
         return selected_files
     
-    def _render_comparison_overview(self):
+    def _render_comparison_overview(self, selected_files):
         """Render high-level comparison metrics"""
-        if 'selected_comparison_files' not in st.session_state or len(st.session_state.selected_comparison_files) < 2:
-            return
-        
         st.subheader("📈 Comparison Overview")
         
-        selected_files = st.session_state.selected_comparison_files
-        
         # Create comparison metrics table
-        comparison_data = []
-        for file_name in selected_files:
-            data = self.files_data[file_name]
-            comparison_data.append({
-                'File': file_name.split('_', 2)[-1] if '_' in file_name else file_name,  # Clean filename
-                'Total Records': len(data),
-                'Unique Vessels': data[self.config['vessel_col']].nunique(),
-                'Unique E-Forms': data[self.config['eform_col']].nunique(),
-                'Unique Jobs': data[self.config['job_col']].nunique() if self.config['job_col'] in data.columns else 0,
-                'Management Units': data['Management Unit'].nunique() if 'Management Unit' in data.columns else 0,
-                'Fleet Names': data['Fleet Name'].nunique() if 'Fleet Name' in data.columns else 0
-            })
+        comparison_data = [
+            {'File': self._display_names[file_name], **self._summaries[file_name]['overview']}
+            for file_name in selected_files
+        ]
         
         comparison_df = pd.DataFrame(comparison_data)
         st.dataframe(comparison_df, use_container_width=True, hide_index=True)
@@ -115,7 +173,7 @@ class ComparisonDashboard:
             fig.add_trace(
                 go.Bar(
                     x=comparison_df['File'],
-                    y=comparison_df[metric],
+                    y=comparison_df[metric].to_numpy(),
                     name=metric,
                     marker_color=colors[i % len(colors)],
                     showlegend=False
@@ -131,21 +189,15 @@ class ComparisonDashboard:
         
         st.plotly_chart(fig, use_container_width=True)
     
-    def _render_vessel_comparison(self):
+    def _render_vessel_comparison(self, selected_files):
         """Render vessel-based comparison"""
-        if 'selected_comparison_files' not in st.session_state or len(st.session_state.selected_comparison_files) < 2:
-            return
-        
         st.subheader("🚢 Vessel Comparison")
         
-        selected_files = st.session_state.selected_comparison_files
-        
         # Get top vessels from each file
-        vessel_data = {}
-        for file_name in selected_files:
-            data = self.files_data[file_name]
-            vessel_counts = data[self.config['vessel_col']].value_counts().head(10)
-            vessel_data[file_name.split('_', 2)[-1] if '_' in file_name else file_name] = vessel_counts
+        vessel_data = {
+            self._display_names[file_name]: self._summaries[file_name]['top_vessels']
+            for file_name in selected_files
+        }
         
         # Create comparison dataframe
         vessel_comparison = pd.DataFrame(vessel_data).fillna(0)
@@ -155,12 +207,13 @@ class ComparisonDashboard:
             st.write("**Top 10 Vessels by Record Count:**")
             st.dataframe(vessel_comparison, use_container_width=True, hide_index=True)
             
-            # Visualization
+            # Visualization - top 5 for readability
+            top_vessels = vessel_comparison.head(5)
             fig = go.Figure()
-            for file_name in vessel_comparison.columns:
+            for file_name in top_vessels.columns:
                 fig.add_trace(go.Bar(
-                    x=vessel_comparison.index[:5],  # Top 5 for readability
-                    y=vessel_comparison[file_name][:5],
+                    x=top_vessels.index,
+                    y=top_vessels[file_name].to_numpy(),
                     name=file_name,
                     opacity=0.7
                 ))
@@ -174,21 +227,15 @@ class ComparisonDashboard:
             
             st.plotly_chart(fig, use_container_width=True)
     
-    def _render_eform_comparison(self):
+    def _render_eform_comparison(self, selected_files):
         """Render E-form based comparison"""
-        if 'selected_comparison_files' not in st.session_state or len(st.session_state.selected_comparison_files) < 2:
-            return
-        
         st.subheader("📝 E-Form Comparison")
         
-        selected_files = st.session_state.selected_comparison_files
-        
         # Get E-form data from each file
-        eform_data = {}
-        for file_name in selected_files:
-            data = self.files_data[file_name]
-            eform_counts = data[self.config['eform_col']].value_counts().head(10)
-            eform_data[file_name.split('_', 2)[-1] if '_' in file_name else file_name] = eform_counts
+        eform_data = {
+            self._display_names[file_name]: self._summaries[file_name]['top_eforms']
+            for file_name in selected_files
+        }
         
         # Create comparison dataframe
         eform_comparison = pd.DataFrame(eform_data).fillna(0)
@@ -199,49 +246,45 @@ class ComparisonDashboard:
             st.dataframe(eform_comparison, use_container_width=True, hide_index=True)
             
             # Find unique E-forms per file
-            all_eforms = set()
-            file_eforms = {}
-            for file_name in selected_files:
-                data = self.files_data[file_name]
-                eforms = set(data[self.config['eform_col']].dropna().unique())
-                file_eforms[file_name.split('_', 2)[-1] if '_' in file_name else file_name] = eforms
-                all_eforms.update(eforms)
+            file_eforms = {
+                self._display_names[file_name]: self._summaries[file_name]['eforms']
+                for file_name in selected_files
+            }
             
             # Show unique E-forms analysis
             st.write("**E-Form Overlap Analysis:**")
+            # Count in how many files each E-form appears: once means unique to that file,
+            # in every file means common to all
+            file_counts = Counter(eform for eforms in file_eforms.values() for eform in eforms)
+            common_count = sum(1 for count in file_counts.values() if count == len(file_eforms))
+            
             overlap_data = []
             for file_name, eforms in file_eforms.items():
                 overlap_data.append({
                     'File': file_name,
                     'Total E-Forms': len(eforms),
-                    'Unique to This File': len(eforms - set().union(*[ef for fn, ef in file_eforms.items() if fn != file_name])),
-                    'Common E-Forms': len(eforms.intersection(*[ef for fn, ef in file_eforms.items() if fn != file_name]))
+                    'Unique to This File': sum(1 for eform in eforms if file_counts[eform] == 1),
+                    'Common E-Forms': common_count
                 })
             
             overlap_df = pd.DataFrame(overlap_data)
             st.dataframe(overlap_df, use_container_width=True, hide_index=True)
     
-    def _render_job_comparison(self):
+    def _render_job_comparison(self, selected_files):
         """Render job-based comparison"""
-        if 'selected_comparison_files' not in st.session_state or len(st.session_state.selected_comparison_files) < 2:
-            return
-        
         st.subheader("💼 Job Comparison")
         
-        selected_files = st.session_state.selected_comparison_files
-        
         # Check if job column exists
         if self.config['job_col'] not in self.files_data[selected_files[0]].columns:
             st.info("Job comparison not available - job column not found in data")
             return
         
         # Get job data from each file
-        job_data = {}
-        for file_name in selected_files:
-            data = self.files_data[file_name]
-            if self.config['job_col'] in data.columns:
-                job_counts = data[self.config['job_col']].value_counts().head(10)
-                job_data[file_name.split('_', 2)[-1] if '_' in file_name else file_name] = job_counts
+        job_data = {
+            self._display_names[file_name]: self._summaries[file_name]['top_jobs']
+            for file_name in selected_files
+            if self._summaries[file_name]['top_jobs'] is not None
+        }
         
         if job_data:
             # Create comparison dataframe
@@ -253,12 +296,11 @@ class ComparisonDashboard:
             
             # Show jobs with E-forms comparison
             st.write("**Jobs with E-Forms Comparison:**")
-            eform_jobs_data = {}
-            for file_name in selected_files:
-                data = self.files_data[file_name]
-                if self.config['job_col'] in data.columns:
-                    jobs_with_eforms = data[data[self.config['eform_col']].notna()][self.config['job_col']].value_counts().head(10)
-                    eform_jobs_data[file_name.split('_', 2)[-1] if '_' in file_name else file_name] = jobs_with_eforms
+            eform_jobs_data = {
+                self._display_names[file_name]: self._summaries[file_name]['top_jobs_with_eforms']
+                for file_name in selected_files
+                if self._summaries[file_name]['top_jobs_with_eforms'] is not None
+            }
             
             if eform_jobs_data:
                 eform_jobs_comparison = pd.DataFrame(eform_jobs_data).fillna(0)
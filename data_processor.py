@@ -1,13 +1,21 @@
 import pandas as pd
 import numpy as np
+import re
 from datetime import datetime
 
+# Column names that look like they hold dates
+DATE_COLUMN_PATTERN = re.compile(r'date|time|created|updated|deadline', re.IGNORECASE)
+
 class DataProcessor:
     """Handles data processing and analysis operations"""
     
     def __init__(self, data, config):
-        self.data = data.copy()
+        # Shallow copy: preprocessing only assigns whole columns, so the caller's frame is never
+        # modified and the untouched columns share memory with it
+        self.data = data.copy(deep=False)
         self.config = config
+        self._hierarchy_index = None
+        self._summary_cache = {}
         self._preprocess_data()
     
     def _preprocess_data(self):
@@ -34,17 +42,29 @@ class DataProcessor:
             if not numeric_series.isna().all():
                 self.data[f'{eform_col}_numeric'] = numeric_series
         
+        # Key columns drive every groupby, isin and crosstab, so work on integer codes
+        for col in required_cols:
+            if not isinstance(self.data[col].dtype, pd.CategoricalDtype):
+                self.data[col] = self.data[col].astype('category')
+        
         # Add derived columns
-        self.data['record_id'] = range(1, len(self.data) + 1)
+        self.data['record_id'] = np.arange(1, len(self.data) + 1, dtype=np.uint32)
         
-        # Handle date columns if any exist
-        date_columns = self.data.select_dtypes(include=['datetime64', 'object']).columns
+        # Handle date columns if any exist - only columns named like dates are candidates
+        date_columns = [
+            col for col in self.data.select_dtypes(include=['datetime64', 'object']).columns
+            if DATE_COLUMN_PATTERN.search(str(col)) and col not in required_cols  # Don't convert our key columns
+        ]
         for col in date_columns:
-            if col not in required_cols:  # Don't convert our key columns
-                try:
-                    self.data[f'{col}_date'] = pd.to_datetime(self.data[col], errors='coerce', dayfirst=True, format='mixed')
-                except:
-                    pass
+            try:
+                # Skip the full conversion unless a sample of the values mostly parses as dates
+                sample = self.data[col].dropna().head(100)
+                parsed = pd.to_datetime(sample, errors='coerce', dayfirst=True, format='mixed')
+                if sample.empty or parsed.notna().mean() < 0.5:
+                    continue
+                self.data[f'{col}_date'] = pd.to_datetime(self.data[col], errors='coerce', dayfirst=True, format='mixed')
+            except:
+                pass
     
     def get_data(self):
         """Return the processed data"""
@@ -54,81 +74,88 @@ class DataProcessor:
         """Return the configuration"""
         return self.config
     
+    def get_hierarchy_index(self):
+        """Row positions keyed by a sorted (Management Unit, Fleet Name, vessel) MultiIndex, built once"""
+        if self._hierarchy_index is None:
+            levels = ['Management Unit', 'Fleet Name', self.config['vessel_col']]
+            self._hierarchy_index = pd.Series(
+                np.arange(len(self.data)), index=pd.MultiIndex.from_frame(self.data[levels])
+            ).sort_index()
+        return self._hierarchy_index
+    
+    def get_eform_notna(self):
+        """Boolean array marking rows with a completed E-Form, computed once"""
+        return self._cached_summary('eform_notna', lambda: self.data[self.config['eform_col']].notna().to_numpy())
+    
     def get_vessel_summary(self):
         """Generate vessel-based summary statistics"""
-        vessel_col = self.config['vessel_col']
-        eform_col = self.config['eform_col']
-        
-        # Group by vessel
-        vessel_groups = self.data.groupby(vessel_col)
-        
-        summary_data = []
-        for vessel, group in vessel_groups:
-            if pd.isna(vessel):
-                vessel = "Unknown"
-            
-            # Basic statistics
-            record_count = len(group)
-            eform_completion = group[eform_col].notna().sum()
-            completion_rate = (eform_completion / record_count) * 100 if record_count > 0 else 0
-            
-            # Job diversity
-            unique_jobs = group[self.config['job_col']].nunique()
-            
-            # E-form statistics
-            eform_stats = self._calculate_eform_stats(group[eform_col])
-            
-            summary_data.append({
-                'Vessel': vessel,
-                'Total_Records': record_count,
-                'EForm_Completed': eform_completion,
-                'Completion_Rate_%': round(completion_rate, 2),
-                'Unique_Jobs': unique_jobs,
-                'EForm_Unique_Values': eform_stats['unique_count'],
-                'EForm_Most_Common': eform_stats['most_common'],
-                'Data_Quality_Score': eform_stats['quality_score']
-            })
-        
-        df = pd.DataFrame(summary_data)
-        return df.set_index('Vessel') if not df.empty else pd.DataFrame()
+        return self._cached_summary('vessel', self._vessel_summary)
     
     def get_job_summary(self):
         """Generate job-based summary statistics"""
-        job_col = self.config['job_col']
-        eform_col = self.config['eform_col']
+        return self._cached_summary('job', self._job_summary)
+    
+    def get_vessel_summary_reset(self):
+        """Vessel summary with the vessel as a regular column, as the charts expect"""
+        return self._cached_summary('vessel_reset', lambda: self.get_vessel_summary().reset_index())
+    
+    def get_job_summary_reset(self):
+        """Job summary with the job as a regular column, as the charts expect"""
+        return self._cached_summary('job_reset', lambda: self.get_job_summary().reset_index())
+    
+    def _cached_summary(self, key, build):
+        """Build a summary on first request; the processed data never changes afterwards"""
+        if key not in self._summary_cache:
+            self._summary_cache[key] = build()
+        return self._summary_cache[key]
+    
+    def _vessel_summary(self):
+        """Vessel-based summary statistics"""
+        summary = self._group_summary(self.config['vessel_col'], self.config['job_col'], 'Unique_Jobs')
+        if summary.empty:
+            return pd.DataFrame()
         
-        # Group by job
-        job_groups = self.data.groupby(job_col)
+        # Quality score based on completion rate
+        summary['Data_Quality_Score'] = (summary['EForm_Completed'] / summary['Total_Records'] * 100).round(1)
+        return summary.rename_axis('Vessel')
+    
+    def _job_summary(self):
+        """Job-based summary statistics"""
+        summary = self._group_summary(self.config['job_col'], self.config['vessel_col'], 'Unique_Vessels')
+        if summary.empty:
+            return pd.DataFrame()
         
-        summary_data = []
-        for job, group in job_groups:
-            if pd.isna(job):
-                job = "Unknown"
-            
-            # Basic statistics
-            record_count = len(group)
-            eform_completion = group[eform_col].notna().sum()
-            completion_rate = (eform_completion / record_count) * 100 if record_count > 0 else 0
-            
-            # Vessel diversity
-            unique_vessels = group[self.config['vessel_col']].nunique()
-            
-            # E-form statistics
-            eform_stats = self._calculate_eform_stats(group[eform_col])
-            
-            summary_data.append({
-                'Job': job,
-                'Total_Records': record_count,
-                'EForm_Completed': eform_completion,
-                'Completion_Rate_%': round(completion_rate, 2),
-                'Unique_Vessels': unique_vessels,
-                'EForm_Unique_Values': eform_stats['unique_count'],
-                'EForm_Most_Common': eform_stats['most_common'],
-                'Avg_Records_Per_Vessel': round(record_count / unique_vessels, 2) if unique_vessels > 0 else 0
-            })
+        unique_vessels = summary['Unique_Vessels']
+        summary['Avg_Records_Per_Vessel'] = (
+            (summary['Total_Records'] / unique_vessels.where(unique_vessels > 0)).round(2).fillna(0)
+        )
+        return summary.rename_axis('Job')
+    
+    def _group_summary(self, group_col, distinct_col, distinct_name):
+        """Record counts, E-form completion and most common E-form per group in one grouped pass"""
+        eform_col = self.config['eform_col']
         
-        df = pd.DataFrame(summary_data)
-        return df.set_index('Job') if not df.empty else pd.DataFrame()
+        summary = self.data.groupby(group_col, observed=True).agg(**{
+            'Total_Records': (eform_col, 'size'),
+            'EForm_Completed': (eform_col, 'count'),
+            distinct_name: (distinct_col, 'nunique'),
+            'EForm_Unique_Values': (eform_col, 'nunique')
+        })
+        summary.insert(2, 'Completion_Rate_%', (summary['EForm_Completed'] / summary['Total_Records'] * 100).round(2))
+        
+        # Most common E-form per group: count (group, E-form) pairs, keep the largest count per group.
+        # Ties go where value_counts() puts them: category order for categoricals, else first seen
+        categorical = isinstance(self.data[eform_col].dtype, pd.CategoricalDtype)
+        most_common = (
+            self.data.groupby([group_col, eform_col], observed=True, sort=categorical).size()
+            .reset_index(name='count')
+            .sort_values('count', ascending=False, kind='stable')
+            .drop_duplicates(group_col)
+            .set_index(group_col)[eform_col]
+            .astype(str)
+        )
+        summary['EForm_Most_Common'] = most_common.reindex(summary.index).fillna('N/A')
+        return summary
     
     def get_cross_analysis(self):
         """Generate cross-analysis between vessels and jobs"""
@@ -136,70 +163,84 @@ class DataProcessor:
         job_col = self.config['job_col']
         eform_col = self.config['eform_col']
         
-        # Create pivot table for cross-analysis
+        # Count completed E-forms per (vessel, job) and pivot jobs into columns; the groups are left
+        # unsorted and only the small pivoted table is ordered for display
         try:
-            cross_table = pd.crosstab(
-                self.data[vessel_col].fillna('Unknown'),
-                self.data[job_col].fillna('Unknown'),
-                values=self.data[eform_col].notna(),
-                aggfunc='sum'
-            ).fillna(0)
+            cross_table = (
+                self.data[eform_col]
+                .groupby([self._labelled(vessel_col), self._labelled(job_col)], observed=True, sort=False)
+                .count()
+                .unstack(fill_value=0)
+                .sort_index()
+                .sort_index(axis=1)
+            )
             
             return cross_table
         except Exception as e:
             # Return empty DataFrame if cross-analysis fails
             return pd.DataFrame()
     
+    def _labelled(self, col):
+        """Column values with missing entries labelled 'Unknown'"""
+        series = self.data[col]
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            return series.fillna('Unknown')
+        
+        # Categoricals only accept known categories; drop unused ones so they don't become empty rows/columns
+        if 'Unknown' not in series.cat.categories:
+            series = series.cat.add_categories('Unknown')
+        series = series.fillna('Unknown').cat.remove_unused_categories()
+        
+        # Sort the categories so 'Unknown' takes its sorted place when the table is ordered by label
+        return series.cat.reorder_categories(series.cat.categories.sort_values())
+    
     def filter_by_vessels(self, vessel_list):
         """Filter data by selected vessels"""
-        vessel_col = self.config['vessel_col']
-        return self.data[self.data[vessel_col].isin(vessel_list)]
+        return self.data[self._isin_mask(self.config['vessel_col'], vessel_list)]
     
     def filter_by_jobs(self, job_list):
         """Filter data by selected jobs"""
-        job_col = self.config['job_col']
-        return self.data[self.data[job_col].isin(job_list)]
-    
-    def _calculate_eform_stats(self, series):
-        """Calculate statistics for e-form column"""
-        stats = {
-            'unique_count': series.nunique(),
-            'most_common': 'N/A',
-            'quality_score': 0
-        }
-        
-        # Most common value
-        if not series.empty and series.notna().any():
-            value_counts = series.value_counts()
-            if not value_counts.empty:
-                stats['most_common'] = str(value_counts.index[0])
-        
-        # Quality score based on completion rate
-        if len(series) > 0:
-            completion_rate = series.notna().sum() / len(series)
-            stats['quality_score'] = round(completion_rate * 100, 1)
-        
-        return stats
+        return self.data[self._isin_mask(self.config['job_col'], job_list)]
+    
+    def _isin_mask(self, col, values):
+        """Boolean mask of rows whose value is in values, tested on category codes for categoricals"""
+        series = self.data[col]
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            return series.isin(values).to_numpy()
+        
+        # Mark the selected codes in a lookup table; the extra last slot stays False so
+        # missing values (code -1) are never selected
+        selected_codes = series.cat.categories.get_indexer(np.asarray(values, dtype=object))
+        selected = np.zeros(len(series.cat.categories) + 1, dtype=bool)
+        selected[selected_codes[selected_codes >= 0]] = True
+        return selected[series.cat.codes.to_numpy()]
     
     def get_column_info(self):
         """Get information about all columns in the dataset"""
-        info = []
-        for col in self.data.columns:
-            col_info = {
-                'Column': col,
-                'Type': str(self.data[col].dtype),
-                'Non_Null_Count': self.data[col].notna().sum(),
-                'Null_Count': self.data[col].isna().sum(),
-                'Unique_Values': self.data[col].nunique()
-            }
-            
-            if self.data[col].dtype in ['int64', 'float64']:
-                col_info.update({
-                    'Mean': round(self.data[col].mean(), 2) if self.data[col].notna().any() else 'N/A',
-                    'Min': self.data[col].min() if self.data[col].notna().any() else 'N/A',
-                    'Max': self.data[col].max() if self.data[col].notna().any() else 'N/A'
-                })
-            
-            info.append(col_info)
+        # One frame-wide reduction per statistic instead of several passes per column
+        null_counts = self.data.isna().sum()
+        non_null_counts = len(self.data) - null_counts
+        info = pd.DataFrame({
+            'Column': self.data.columns,
+            'Type': self.data.dtypes.astype(str).to_numpy(),
+            'Non_Null_Count': non_null_counts.to_numpy(),
+            'Null_Count': null_counts.to_numpy(),
+            'Unique_Values': self.data.nunique().to_numpy()
+        })
+        
+        numeric_cols = [col for col, dtype in self.data.dtypes.items() if dtype.kind in 'iuf']  # any integer or float width
+        if numeric_cols:
+            numeric = self.data[numeric_cols]
+            # Min/Max are object-typed so integer columns keep integer values instead of upcasting to float
+            stats = pd.DataFrame({
+                'Mean': numeric.mean().round(2),
+                'Min': pd.Series({col: numeric[col].min() for col in numeric_cols}, dtype=object),
+                'Max': pd.Series({col: numeric[col].max() for col in numeric_cols}, dtype=object)
+            })
+            has_values = non_null_counts[numeric_cols] > 0
+            if not has_values.all():
+                stats = stats.astype(object).where(has_values, 'N/A', axis=0)
+            for stat in ('Mean', 'Min', 'Max'):
+                info[stat] = stats[stat].reindex(self.data.columns).to_numpy()
         
-        return pd.DataFrame(info)
+        return info
@@ -1,31 +1,73 @@
 import streamlit as st
 import pandas as pd
 import openpyxl
+import re
 from io import BytesIO
 import chardet
 
+# Patterns used to normalise vessel names before merging with fleet data
+_VESSEL_SPECIAL_CHARS = re.compile(r'[^a-zA-Z0-9\s]')
+_VESSEL_WHITESPACE = re.compile(r'\s+')
+
+def _clean_vessel_names(names):
+    """Remove special characters and extra spaces and lowercase vessel names; missing names become ''"""
+    cleaned = (
+        names.astype(str)
+        .str.replace(_VESSEL_SPECIAL_CHARS, '', regex=True)
+        .str.replace(_VESSEL_WHITESPACE, ' ', regex=True)
+        .str.strip()
+        .str.lower()
+    )
+    return cleaned.mask(names.isna(), '')
+
+def _temporal_objects_to_text(df):
+    """Turn the datetime.date/datetime.time objects pyarrow infers for ISO dates and times back
+    into the text the C parser returns, so both CSV engines hand on the same columns"""
+    for col in df.select_dtypes(include='object').columns:
+        if pd.api.types.infer_dtype(df[col], skipna=True) in ('date', 'time'):
+            df[col] = df[col].astype(str).mask(df[col].isna())
+    return df
+
 class FileHandler:
     """Handles file upload and processing for Excel and CSV files"""
     
     def __init__(self):
         self.supported_formats = ['csv', 'xlsx', 'xls']
+        self.csv_chunksize = 200_000
+        self.encoding_sample_size = 64 * 1024
     
     def process_file(self, uploaded_file):
         """Process uploaded file and return pandas DataFrame with fleet data merged"""
         try:
             file_extension = uploaded_file.name.split('.')[-1].lower()
+            if file_extension not in self.supported_formats:
+                raise ValueError(f"Unsupported file format: {file_extension}")
+            
+            # Sheet selectors are rendered on every rerun so they keep their state
+            sheet_name = None if file_extension == 'csv' else self._select_sheet(uploaded_file, "sheet_selector")
+            fleet_file = st.session_state.get('uploaded_fleet_file')
+            fleet_sheet = self._fleet_sheet(fleet_file)
+            
+            # Reruns with the same uploads and sheets reuse the processed data; file_id changes
+            # on every upload, so a re-uploaded file with the same name and size is read again
+            cache_key = (
+                uploaded_file.file_id, uploaded_file.name, uploaded_file.size, sheet_name,
+                (fleet_file.file_id, fleet_file.name, fleet_file.size) if fleet_file is not None else None,
+                fleet_sheet
+            )
+            cached = st.session_state.get('processed_file_cache')
+            if cached is not None and cached[0] == cache_key:
+                return cached[1]
             
             if file_extension == 'csv':
                 eform_data = self._process_csv(uploaded_file)
-            elif file_extension in ['xlsx', 'xls']:
-                eform_data = self._process_excel(uploaded_file)
             else:
-                raise ValueError(f"Unsupported file format: {file_extension}")
+                eform_data = self._process_excel(uploaded_file, sheet_name)
             
             # Merge with fleet data if available
             if eform_data is not None:
-                merged_data = self._merge_with_fleet_data(eform_data)
-                return merged_data
+                eform_data = self._merge_with_fleet_data(eform_data, fleet_sheet)
+                st.session_state.processed_file_cache = (cache_key, eform_data)
             
             return eform_data
                 
@@ -36,17 +78,19 @@ class FileHandler:
     def _process_csv(self, uploaded_file):
         """Process CSV file with encoding detection"""
         try:
-            # Reset file pointer
+            # Reset file pointer and sniff the encoding from the start of the file only
             uploaded_file.seek(0)
-            raw_data = uploaded_file.read()
+            raw_data = uploaded_file.read(self.encoding_sample_size)
             
             # Detect encoding
             encoding_result = chardet.detect(raw_data)
-            encoding = encoding_result['encoding'] if encoding_result['encoding'] else 'utf-8'
+            encoding = encoding_result['encoding']
+            # Non-ASCII bytes may only appear after the sample; UTF-8 is a superset of ASCII
+            if not encoding or encoding.lower() == 'ascii':
+                encoding = 'utf-8'
             
-            # Reset file pointer and read with detected encoding
-            uploaded_file.seek(0)
-            df = pd.read_csv(uploaded_file, encoding=encoding)
+            # Read with detected encoding
+            df = self._read_csv(uploaded_file, encoding)
             
             return self._clean_dataframe(df)
             
@@ -54,8 +98,7 @@ class FileHandler:
             # Fallback encodings
             for encoding in ['latin-1', 'cp1252', 'iso-8859-1']:
                 try:
-                    uploaded_file.seek(0)
-                    df = pd.read_csv(uploaded_file, encoding=encoding)
+                    df = self._read_csv(uploaded_file, encoding)
                     return self._clean_dataframe(df)
                 except:
                     continue
@@ -64,67 +107,115 @@ class FileHandler:
         except Exception as e:
             raise ValueError(f"Error reading CSV file: {str(e)}")
     
-    def _process_excel(self, uploaded_file):
+    def _read_csv(self, uploaded_file, encoding):
+        """Read CSV file with the multithreaded pyarrow parser, or in chunks with the C parser"""
+        uploaded_file.seek(0)
+        try:
+            df = pd.read_csv(uploaded_file, encoding=encoding, engine='pyarrow')
+            # pyarrow keeps duplicate and blank headers as they are; the C parser renames them
+            # to 'name.1' and 'Unnamed: N', so such files are re-read below
+            if not df.columns.has_duplicates and '' not in df.columns:
+                return _temporal_objects_to_text(df)
+        except Exception:
+            # pyarrow missing or unable to parse the file - decoding errors surface from the C parser below
+            pass
+        
+        uploaded_file.seek(0)
+        chunks = pd.read_csv(uploaded_file, encoding=encoding, chunksize=self.csv_chunksize)
+        return pd.concat(chunks, ignore_index=True)
+    
+    def _read_excel(self, uploaded_file, sheet_name):
+        """Read an Excel sheet with the calamine reader, falling back to the default engine"""
+        try:
+            return pd.read_excel(uploaded_file, sheet_name=sheet_name, engine='calamine')
+        except (ImportError, ValueError):
+            # python-calamine not installed, or a pandas version without the calamine engine
+            uploaded_file.seek(0)
+            return pd.read_excel(uploaded_file, sheet_name=sheet_name)
+    
+    def _process_excel(self, uploaded_file, sheet_name=None, sheet_key="sheet_selector"):
         """Process Excel file"""
         try:
-            # Read Excel file
-            excel_file = pd.ExcelFile(uploaded_file)
-            
-            # If multiple sheets, let user choose or use first sheet
-            if len(excel_file.sheet_names) > 1:
-                sheet_name = st.selectbox(
-                    "Select sheet to analyze:",
-                    options=excel_file.sheet_names,
-                    key="sheet_selector"
-                )
-            else:
-                sheet_name = excel_file.sheet_names[0]
+            # If no sheet was chosen yet, let user choose or use first sheet
+            if sheet_name is None:
+                sheet_name = self._select_sheet(uploaded_file, sheet_key)
             
-            df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
+            df = self._read_excel(uploaded_file, sheet_name)
             return self._clean_dataframe(df)
             
         except Exception as e:
             raise ValueError(f"Error reading Excel file: {str(e)}")
     
+    def _select_sheet(self, uploaded_file, sheet_key):
+        """Return the sheet to read, asking the user when the workbook has several"""
+        # Sheet names are kept per upload so reruns don't reopen the workbook
+        sheet_names_cache = st.session_state.setdefault('excel_sheet_names', {})
+        file_key = uploaded_file.file_id
+        if file_key not in sheet_names_cache:
+            sheet_names_cache[file_key] = pd.ExcelFile(uploaded_file).sheet_names
+            uploaded_file.seek(0)
+        sheet_names = sheet_names_cache[file_key]
+        
+        if len(sheet_names) > 1:
+            return st.selectbox(
+                "Select sheet to analyze:",
+                options=sheet_names,
+                key=sheet_key
+            )
+        return sheet_names[0]
+    
+    def _fleet_sheet(self, fleet_file):
+        """Sheet to read from an Excel fleet file; None for CSV files or unreadable workbooks"""
+        if fleet_file is None or fleet_file.name.endswith('.csv'):
+            return None
+        try:
+            return self._select_sheet(fleet_file, "fleet_sheet_selector")
+        except Exception:
+            # Reported by the fleet merge, which carries on with E-form data only
+            return None
+    
+    def _load_fleet_file(self, fleet_file, sheet_name):
+        """Parse the uploaded fleet file, reusing the previous parse while the upload and sheet are unchanged"""
+        is_csv = fleet_file.name.endswith('.csv')
+        cache_key = (fleet_file.file_id, sheet_name)
+        
+        cached = st.session_state.get('fleet_data_cache')
+        if cached is None or cached[0] != cache_key:
+            if is_csv:
+                fleet_data = self._process_csv(fleet_file)
+            else:
+                fleet_data = self._process_excel(fleet_file, sheet_name, "fleet_sheet_selector")
+            cached = (cache_key, fleet_data)
+            st.session_state.fleet_data_cache = cached
+        
+        # Shallow copy so the merge's helper column never lands in the cached frame
+        return cached[1].copy(deep=False)
+    
     def _clean_dataframe(self, df):
         """Clean and validate DataFrame"""
         if df.empty:
             raise ValueError("The uploaded file is empty")
         
-        # Remove completely empty rows and columns
-        df = df.dropna(how='all').dropna(axis=1, how='all')
+        # Remove completely empty columns (this includes empty 'Unnamed:' columns), then
+        # completely empty rows, resetting the index in the same step
+        df = df.dropna(axis=1, how='all').dropna(how='all', ignore_index=True)
         
         # Clean column names
         df.columns = df.columns.astype(str).str.strip()
         
-        # Remove unnamed columns that are completely empty
-        unnamed_cols = [col for col in df.columns if col.startswith('Unnamed:')]
-        for col in unnamed_cols:
-            if df[col].isna().all():
-                df = df.drop(columns=[col])
-        
-        # Reset index
-        df = df.reset_index(drop=True)
-        
         if df.empty:
             raise ValueError("No valid data found after cleaning")
         
         return df
     
-    def _merge_with_fleet_data(self, eform_data):
+    def _merge_with_fleet_data(self, eform_data, fleet_sheet=None):
         """Merge E-form data with Fleet data based on cleaned vessel names"""
         try:
-            import re
-            
             # Check if user uploaded a fleet file
             fleet_data = None
             if hasattr(st.session_state, 'uploaded_fleet_file') and st.session_state.uploaded_fleet_file is not None:
                 # Use uploaded fleet file
-                fleet_file = st.session_state.uploaded_fleet_file
-                if fleet_file.name.endswith('.csv'):
-                    fleet_data = self._process_csv(fleet_file)
-                else:
-                    fleet_data = self._process_excel(fleet_file)
+                fleet_data = self._load_fleet_file(st.session_state.uploaded_fleet_file, fleet_sheet)
                 st.info("Using uploaded fleet file for data merging.")
             else:
                 # No fleet file uploaded - return E-form data without merging
@@ -135,15 +226,6 @@ class FileHandler:
                 st.warning("No fleet data available for merging.")
                 return eform_data
             
-            # Clean vessel names function
-            def clean_vessel_name(name):
-                if pd.isna(name):
-                    return ''
-                # Remove special characters, extra spaces, convert to lowercase
-                cleaned = re.sub(r'[^a-zA-Z0-9\s]', '', str(name))
-                cleaned = re.sub(r'\s+', ' ', cleaned).strip().lower()
-                return cleaned
-            
             # Identify vessel column in fleet data
             vessel_col_candidates = [col for col in fleet_data.columns if any(keyword in col.lower() for keyword in ['vessel', 'ship', 'boat'])]
             fleet_vessel_col = vessel_col_candidates[0] if vessel_col_candidates else fleet_data.columns[0]
@@ -153,8 +235,8 @@ class FileHandler:
             fleet_col = fleet_col_candidates[0] if fleet_col_candidates else 'Fleet'
             
             # Create mapping for vessel names
-            eform_data['vessel_cleaned'] = eform_data['Vessel'].apply(clean_vessel_name)
-            fleet_data['vessel_cleaned'] = fleet_data[fleet_vessel_col].apply(clean_vessel_name)
+            eform_data['vessel_cleaned'] = _clean_vessel_names(eform_data['Vessel'])
+            fleet_data['vessel_cleaned'] = _clean_vessel_names(fleet_data[fleet_vessel_col])
             
             # Select relevant columns for merging
             merge_columns = ['vessel_cleaned', fleet_col]
@@ -191,14 +273,13 @@ class FileHandler:
     def _split_fleet_column(self, data, fleet_col):
         """Split Fleet column by first space into Management Unit and Fleet Name"""
         try:
-            # Create the split columns
-            data['Management Unit'] = data[fleet_col].apply(
-                lambda x: str(x).split(' ', 1)[0] if pd.notna(x) and ' ' in str(x) else str(x) if pd.notna(x) else ''
-            )
+            # Split once on the first space; values without a space have no Fleet Name part,
+            # so make sure the second column exists even if no value contains a space
+            parts = data[fleet_col].astype('string').str.split(' ', n=1, expand=True)
+            parts = parts.reindex(columns=[0, 1]).astype('string')
             
-            data['Fleet Name'] = data[fleet_col].apply(
-                lambda x: str(x).split(' ', 1)[1] if pd.notna(x) and ' ' in str(x) and len(str(x).split(' ', 1)) > 1 else ''
-            )
+            data['Management Unit'] = parts[0].fillna('')
+            data['Fleet Name'] = parts[1].fillna('')
             
             st.info(f"✅ Fleet column split into 'Management Unit' and 'Fleet Name' columns.")
             return data
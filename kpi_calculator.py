@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
 
+# Record volume at which the performance score's volume component saturates (log scale)
+LOG10_FULL_VOLUME = np.log10(1000)
+
+# Largest vessel x job grid counted densely from category codes; bigger grids fall back to groupby
+MAX_DENSE_GROUPS = 1_000_000
+
 class KPICalculator:
     """Calculates various KPIs for the e-form analysis"""
     
@@ -8,14 +14,56 @@ class KPICalculator:
         self.data_processor = data_processor
         self.data = data_processor.get_data()
         self.config = data_processor.get_config()
+        self._kpi_cache = {}
+        self._kpi_fingerprint = None
+    
+    def _cached(self, name, calculate):
+        """Return a stored result, recalculating only when the processor's data has changed"""
+        data = self.data_processor.get_data()
+        fingerprint = (id(data), len(data), tuple(data.columns))
+        if fingerprint != self._kpi_fingerprint:
+            self.data = data
+            self._kpi_cache = {}
+            self._kpi_fingerprint = fingerprint
+        
+        if name not in self._kpi_cache:
+            self._kpi_cache[name] = calculate()
+        return self._kpi_cache[name]
+    
+    def _vc(self, col):
+        """Value counts of a column's observed non-null values, shared by all KPI calculations"""
+        def count_values():
+            counts = self.data[col].value_counts()
+            # Categorical columns also list unused categories with a zero count
+            return counts[counts > 0]
+        return self._cached(('value_counts', col), count_values)
+    
+    def _eform_stats(self):
+        """Counts for the e-form column shared by the e-form KPIs and statistics"""
+        def count_eforms():
+            value_counts = self._vc(self.config['eform_col'])
+            total_forms = len(self.data)
+            completed_forms = value_counts.sum()
+            null_count = total_forms - completed_forms
+            return {
+                'total_forms': total_forms,
+                'completed_forms': completed_forms,
+                'completion_rate': (completed_forms / total_forms) * 100 if total_forms > 0 else 0,
+                'unique_values': len(value_counts),
+                'null_count': null_count,
+                # Rows left after drop_duplicates: each distinct value plus one null row, if any
+                'distinct_rows': len(value_counts) + (null_count > 0),
+                'most_common': value_counts.index[0] if not value_counts.empty else 'N/A'
+            }
+        return self._cached('eform_stats', count_eforms)
     
     def calculate_summary_kpis(self):
         """Calculate comprehensive KPIs for vessels, jobs, and e-forms"""
-        return {
+        return self._cached('summary_kpis', lambda: {
             'vessel_kpis': self._calculate_vessel_kpis(),
             'job_kpis': self._calculate_job_kpis(),
             'eform_kpis': self._calculate_eform_kpis()
-        }
+        })
     
     def _calculate_vessel_kpis(self):
         """Calculate vessel-related KPIs"""
@@ -64,12 +112,12 @@ class KPICalculator:
         most_efficient = job_data['Completion_Rate_%'].idxmax() if not job_data.empty else 'N/A'
         
         # Job diversity score (based on distribution evenness)
-        job_counts = self.data[job_col].value_counts()
-        if len(job_counts) > 1:
-            # Calculate entropy as diversity measure
+        job_counts = self._vc(job_col).to_numpy()
+        if job_counts.size > 1:
+            # Calculate entropy as diversity measure on the raw counts
             probabilities = job_counts / job_counts.sum()
-            entropy = -np.sum(probabilities * np.log2(probabilities))
-            max_entropy = np.log2(len(job_counts))
+            entropy = -(probabilities * np.log2(probabilities)).sum()
+            max_entropy = np.log2(job_counts.size)
             diversity_score = (entropy / max_entropy) * 100 if max_entropy > 0 else 0
         else:
             diversity_score = 0
@@ -83,96 +131,101 @@ class KPICalculator:
     
     def _calculate_eform_kpis(self):
         """Calculate e-form related KPIs"""
-        eform_col = self.config['eform_col']
-        eform_data = self.data[eform_col]
-        
-        total_forms = len(eform_data)
-        completed_forms = eform_data.notna().sum()
-        completion_rate = (completed_forms / total_forms) * 100 if total_forms > 0 else 0
-        unique_values = eform_data.nunique()
+        stats = self._eform_stats()
+        total_forms = stats['total_forms']
         
         # Data quality metrics
-        null_count = eform_data.isna().sum()
-        duplicate_rate = (len(eform_data) - len(eform_data.drop_duplicates())) / len(eform_data) * 100 if len(eform_data) > 0 else 0
+        duplicate_rate = (total_forms - stats['distinct_rows']) / total_forms * 100 if total_forms > 0 else 0
         
         # Consistency score (lower is better for duplicates)
         consistency_score = 100 - duplicate_rate
         
         return {
             'Total E-Forms': total_forms,
-            'Completion Rate': f"{completion_rate:.1f}%",
-            'Unique Values': unique_values,
-            'Null Values': null_count,
+            'Completion Rate': f"{stats['completion_rate']:.1f}%",
+            'Unique Values': stats['unique_values'],
+            'Null Values': stats['null_count'],
             'Consistency Score': f"{consistency_score:.1f}%"
         }
     
     def calculate_completion_rate(self):
         """Calculate overall data completion rate"""
+        return self._cached('completion_rate', self._calculate_completion_rate)
+    
+    def _calculate_completion_rate(self):
+        """Share of non-null cells across the whole dataset"""
         total_cells = len(self.data) * len(self.data.columns)
-        null_cells = self.data.isna().sum().sum()
+        # Count nulls column by column instead of materializing a frame-sized boolean mask
+        null_cells = sum(int(values.isna().sum()) for _, values in self.data.items())
         completion_rate = ((total_cells - null_cells) / total_cells) * 100 if total_cells > 0 else 0
         return completion_rate
     
     def calculate_eform_statistics(self):
         """Calculate detailed e-form statistics"""
-        eform_col = self.config['eform_col']
-        eform_data = self.data[eform_col]
-        
-        total_forms = len(eform_data)
-        completed_forms = eform_data.notna().sum()
-        completion_rate = (completed_forms / total_forms) * 100 if total_forms > 0 else 0
-        unique_values = eform_data.nunique()
-        null_count = eform_data.isna().sum()
-        
-        # Most common value
-        most_common = 'N/A'
-        if eform_data.notna().any():
-            value_counts = eform_data.value_counts()
-            if not value_counts.empty:
-                most_common = value_counts.index[0]
+        return self._cached('eform_statistics', self._calculate_eform_statistics)
+    
+    def _calculate_eform_statistics(self):
+        """Detailed statistics for the e-form column"""
+        stats = self._eform_stats()
+        completed_forms = stats['completed_forms']
         
         # Quality score based on completion and uniqueness
-        uniqueness_score = (unique_values / completed_forms) * 100 if completed_forms > 0 else 0
-        quality_score = (completion_rate + min(uniqueness_score, 100)) / 2
+        uniqueness_score = (stats['unique_values'] / completed_forms) * 100 if completed_forms > 0 else 0
+        quality_score = (stats['completion_rate'] + min(uniqueness_score, 100)) / 2
         
         return {
-            'total_forms': total_forms,
+            'total_forms': stats['total_forms'],
             'completed_forms': completed_forms,
-            'completion_rate': completion_rate,
-            'unique_values': unique_values,
-            'null_count': null_count,
-            'most_common': most_common,
+            'completion_rate': stats['completion_rate'],
+            'unique_values': stats['unique_values'],
+            'null_count': stats['null_count'],
+            'most_common': stats['most_common'],
             'quality_score': quality_score
         }
     
     def calculate_trend_analysis(self):
         """Calculate trend analysis if date columns are available"""
-        # Look for date columns
-        date_columns = [col for col in self.data.columns if 'date' in col.lower() or col.endswith('_date')]
+        return self._cached('trend_analysis', self._calculate_trend_analysis)
+    
+    def _parsed_dates(self):
+        """First date-like column and its parsed values, or None if there is no date column"""
+        def parse_dates():
+            # Look for date columns
+            date_columns = [col for col in self.data.columns if 'date' in col.lower() or col.endswith('_date')]
+            
+            if not date_columns:
+                return None
+            
+            # Use the first date column found; columns already typed as datetimes need no parsing
+            date_col = date_columns[0]
+            dates = self.data[date_col]
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates, errors='coerce', cache=True)
+            return date_col, dates
+        return self._cached('parsed_dates', parse_dates)
+    
+    def _calculate_trend_analysis(self):
+        """Monthly record counts and completion rates for the first date column"""
+        parsed = self._parsed_dates()
         
-        if not date_columns:
+        if parsed is None:
             return None
         
-        # Use the first date column found
-        date_col = date_columns[0]
-        eform_col = self.config['eform_col']
+        _, dates = parsed
         
         try:
-            # Group by date and calculate completion rates
-            date_data = self.data.copy()
-            date_data[date_col] = pd.to_datetime(date_data[date_col], errors='coerce')
-            date_data = date_data.dropna(subset=[date_col])
+            valid = dates.notna()
             
-            if date_data.empty:
+            if not valid.any():
                 return None
             
-            # Group by month for trend analysis
-            date_data['year_month'] = date_data[date_col].dt.to_period('M')
-            monthly_stats = date_data.groupby('year_month').agg({
-                eform_col: ['count', lambda x: x.notna().sum()]
-            }).round(2)
+            # Group by month for trend analysis; plain sums instead of a per-group lambda
+            monthly_stats = pd.DataFrame({
+                'year_month': dates[valid].dt.to_period('M'),
+                'Total_Records': 1,
+                'Completed_Forms': self.data_processor.get_eform_notna()[valid.to_numpy()].astype(np.int64)
+            }).groupby('year_month').sum()
             
-            monthly_stats.columns = ['Total_Records', 'Completed_Forms']
             monthly_stats['Completion_Rate'] = (monthly_stats['Completed_Forms'] / monthly_stats['Total_Records']) * 100
             
             return monthly_stats
@@ -186,34 +239,56 @@ class KPICalculator:
         job_col = self.config['job_col']
         eform_col = self.config['eform_col']
         
-        # Group by vessel and job
-        grouped = self.data.groupby([vessel_col, job_col])
+        performance = self._vessel_job_counts(vessel_col, job_col, eform_col)
+        if performance.empty:
+            return pd.DataFrame()
         
-        performance_data = []
-        for (vessel, job), group in grouped:
-            vessel_name = str(vessel) if not pd.isna(vessel) else "Unknown"
-            job_name = str(job) if not pd.isna(job) else "Unknown"
-            
-            record_count = len(group)
-            completed_count = group[eform_col].notna().sum()
-            completion_rate = (completed_count / record_count) * 100 if record_count > 0 else 0
-            
-            performance_data.append({
-                'Vessel': vessel_name,
-                'Job': job_name,
-                'Records': record_count,
-                'Completed': completed_count,
-                'Completion_Rate': round(completion_rate, 2),
-                'Performance_Score': self._calculate_performance_score(completion_rate, record_count)
-            })
-        
-        return pd.DataFrame(performance_data)
-    
-    def _calculate_performance_score(self, completion_rate, record_count):
-        """Calculate a composite performance score"""
-        # Normalize record count (log scale to handle wide ranges)
-        normalized_count = min(np.log10(record_count + 1) / np.log10(1000), 1) * 100
-        
-        # Weighted average of completion rate and volume
-        performance_score = (completion_rate * 0.7) + (normalized_count * 0.3)
-        return round(performance_score, 2)
+        records = performance['Records'].to_numpy()
+        completion_rate = performance['Completed'].to_numpy() / records * 100
+        
+        # Composite score: weighted average of completion rate and normalized (log scale) volume
+        normalized_count = np.minimum(np.log10(records + 1) / LOG10_FULL_VOLUME, 1) * 100
+        performance_score = np.round(completion_rate * 0.7 + normalized_count * 0.3, 2)
+        
+        # Assemble from plain arrays; copy=False lets pandas take them without another copy
+        return pd.DataFrame({
+            'Vessel': performance[vessel_col].astype(str).to_numpy(),
+            'Job': performance[job_col].astype(str).to_numpy(),
+            'Records': records,
+            'Completed': performance['Completed'].to_numpy(),
+            'Completion_Rate': np.round(completion_rate, 2),
+            'Performance_Score': performance_score
+        }, copy=False)
+    
+    def _vessel_job_counts(self, vessel_col, job_col, eform_col):
+        """Records and completed e-forms per observed (vessel, job) pair, ordered by vessel then job"""
+        vessels = self.data[vessel_col]
+        jobs = self.data[job_col]
+        
+        if isinstance(vessels.dtype, pd.CategoricalDtype) and isinstance(jobs.dtype, pd.CategoricalDtype):
+            n_jobs = len(jobs.cat.categories)
+            grid_size = len(vessels.cat.categories) * n_jobs
+            if grid_size <= MAX_DENSE_GROUPS:
+                # Count each (vessel, job) cell from the integer codes; code -1 marks a missing value
+                vessel_codes = vessels.cat.codes.to_numpy().astype(np.int64)
+                job_codes = jobs.cat.codes.to_numpy().astype(np.int64)
+                keep = (vessel_codes >= 0) & (job_codes >= 0)
+                cells = vessel_codes[keep] * n_jobs + job_codes[keep]
+                completed = self.data_processor.get_eform_notna()[keep]
+                
+                records = np.bincount(cells, minlength=grid_size)
+                completed_counts = np.bincount(cells[completed], minlength=grid_size)
+                observed = np.flatnonzero(records)
+                return pd.DataFrame({
+                    vessel_col: vessels.cat.categories.take(observed // n_jobs),
+                    job_col: jobs.cat.categories.take(observed % n_jobs),
+                    'Records': records[observed],
+                    'Completed': completed_counts[observed]
+                })
+        
+        # Records and completed e-forms per (vessel, job) in one grouped pass
+        return (
+            self.data.groupby([vessel_col, job_col], observed=True)[eform_col]
+            .agg(Records='size', Completed='count')
+            .reset_index()
+        )
@@ -3,6 +3,27 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
+from functools import lru_cache
+
+@lru_cache(maxsize=16)
+def _empty_chart(message):
+    """Placeholder figure for a message, built once and shared; callers must not modify it"""
+    fig = go.Figure()
+    fig.add_annotation(
+        text=message,
+        x=0.5,
+        y=0.5,
+        xref="paper",
+        yref="paper",
+        showarrow=False,
+        font=dict(size=16)
+    )
+    fig.update_layout(
+        xaxis=dict(showgrid=False, showticklabels=False),
+        yaxis=dict(showgrid=False, showticklabels=False),
+        height=400
+    )
+    return fig
 
 class Visualizer:
     """Creates interactive visualizations for the dashboard"""
@@ -16,7 +37,7 @@ class Visualizer:
             return self._create_empty_chart("No vessel data available")
         
         fig = px.bar(
-            vessel_data.reset_index(),
+            self._as_columns(vessel_data),
             x='Vessel',
             y='Completion_Rate_%',
             title='Vessel Performance - E-Form Completion Rates',
@@ -39,7 +60,7 @@ class Visualizer:
             return self._create_empty_chart("No vessel data available")
         
         fig = px.pie(
-            vessel_data.reset_index(),
+            self._as_columns(vessel_data),
             values='Total_Records',
             names='Vessel',
             title='Distribution of Records by Vessel'
@@ -54,7 +75,7 @@ class Visualizer:
             return self._create_empty_chart("No job data available")
         
         fig = px.bar(
-            job_data.reset_index(),
+            self._as_columns(job_data),
             x='Job',
             y='Completion_Rate_%',
             title='Job Performance - E-Form Completion Rates',
@@ -76,7 +97,7 @@ class Visualizer:
             return self._create_empty_chart("No job data available")
         
         fig = px.scatter(
-            job_data.reset_index(),
+            self._as_columns(job_data),
             x='Total_Records',
             y='Completion_Rate_%',
             size='Unique_Vessels',
@@ -105,14 +126,19 @@ class Visualizer:
         config = st.session_state.config
         eform_col = config['eform_col']
         
-        # Get value counts for e-form column
-        value_counts = data[eform_col].value_counts().head(20)  # Top 20 values
+        # Value counts for the e-form column, counted once per uploaded dataset
+        counts_key = (st.session_state.get('data_token'), eform_col)
+        cached_counts = st.session_state.get('eform_value_counts')
+        if cached_counts is None or cached_counts[0] != counts_key:
+            cached_counts = (counts_key, data[eform_col].value_counts())
+            st.session_state.eform_value_counts = cached_counts
+        value_counts = cached_counts[1].head(20)  # Top 20 values
         
         if value_counts.empty:
             return self._create_empty_chart("No e-form data available")
         
         fig = px.bar(
-            x=value_counts.index.astype(str),
+            x=value_counts.index.astype(str).to_numpy(),
             y=value_counts.values,
             title='E-Form Value Distribution (Top 20)',
             labels={'x': 'E-Form Values', 'y': 'Frequency'}
@@ -170,11 +196,14 @@ class Visualizer:
         if trend_data is None or trend_data.empty:
             return self._create_empty_chart("No trend data available")
         
+        # Period labels are formatted once and shared by both traces
+        x_labels = trend_data.index.astype(str).to_numpy()
+        
         fig = go.Figure()
         
         # Add completion rate line
         fig.add_trace(go.Scatter(
-            x=trend_data.index.astype(str),
+            x=x_labels,
             y=trend_data['Completion_Rate'],
             mode='lines+markers',
             name='Completion Rate (%)',
@@ -183,7 +212,7 @@ class Visualizer:
         
         # Add total records bar
         fig.add_trace(go.Bar(
-            x=trend_data.index.astype(str),
+            x=x_labels,
             y=trend_data['Total_Records'],
             name='Total Records',
             opacity=0.6,
@@ -258,21 +287,12 @@ class Visualizer:
         
         return fig
     
+    def _as_columns(self, summary):
+        """Summary frame with its index as a column; frames already reset are used as is"""
+        if isinstance(summary.index, pd.RangeIndex):
+            return summary
+        return summary.reset_index()
+    
     def _create_empty_chart(self, message):
         """Create an empty chart with a message"""
-        fig = go.Figure()
-        fig.add_annotation(
-            text=message,
-            x=0.5,
-            y=0.5,
-            xref="paper",
-            yref="paper",
-            showarrow=False,
-            font=dict(size=16)
-        )
-        fig.update_layout(
-            xaxis=dict(showgrid=False, showticklabels=False),
-            yaxis=dict(showgrid=False, showticklabels=False),
-            height=400
-        )
-        return fig
+        return _empty_chart(message)